@@ -0,0 +1,365 @@
+# Copyright: (c) 2024, David Villafaña <david.villafana@capcu.org>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from typing import Optional, Callable, Any
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import logging
+import threading
+import hashlib
+import json
+import time
+import os
+
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: object) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+__metaclass__ = type
+
+# a single pooled session keeps the connection to the FICS API alive between calls,
+# a connection that could not be opened is retried instead of failing the whole task.
+# the report endpoints do work on the server (history, updates, saved files) on
+# every POST, so a POST that reached the server is never sent again: read errors
+# are not retried and 502/503 are only retried for the other methods
+_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503),
+    allowed_methods=frozenset(["GET", "PUT", "DELETE"]),
+    raise_on_status=False,
+)
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=_RETRY)
+SESSION = requests.Session()
+SESSION.mount("http://", _ADAPTER)
+SESSION.mount("https://", _ADAPTER)
+# (connect, read) timeout in seconds, large reports can take minutes to render
+_TIMEOUT = (5, 900)
+_HEADERS = {
+    "Content-Type": "application/json",
+    "Connection": "keep-alive",
+    "Accept-Encoding": "gzip, deflate",
+}
+_METHODS = ("post", "get", "put", "delete")
+# ijson events that carry a value, the start/end events only shape the document
+_SCALAR_EVENTS = frozenset(["null", "boolean", "integer", "double", "number", "string"])
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    # FileHandler flushes after every record; here records stay in the stream
+    # buffer until close(), which logging.shutdown() calls when the module exits
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+# every api_calls.log record uses the same format
+_FORMATTER = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# file handlers are created once per log path and reused by every call
+_HANDLERS: dict = {}
+_HANDLERS_LOCK = threading.Lock()
+# (logger name, log path) pairs that are already wired up
+_CONFIGURED_LOGGERS: set = set()
+
+# successful API responses can be cached here and reused for identical requests
+_CACHE_DIR = os.path.expanduser("~/.cache/fics")
+
+
+def _get_logger(name: str, log_path: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if (name, log_path) in _CONFIGURED_LOGGERS:
+        return logger
+
+    # Ensure the directory for the log file exists
+    ensure_dir(log_path)
+
+    with _HANDLERS_LOCK:
+        handler = _HANDLERS.get(log_path)
+        if handler is None:
+            # Create a file handler
+            handler = _BufferedFileHandler(f"{log_path}/api_calls.log")
+            handler.setLevel(logging.INFO)
+            handler.setFormatter(_FORMATTER)
+            _HANDLERS[log_path] = handler
+
+        # Add the handler unless the logger already writes to this file
+        if not any(
+            isinstance(h, logging.FileHandler) and h.baseFilename == handler.baseFilename
+            for h in logger.handlers
+        ):
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+        _CONFIGURED_LOGGERS.add((name, log_path))
+
+    return logger
+
+
+def _redact(value: Any) -> Any:
+    # base64 documents can be megabytes, only their size is worth logging
+    if isinstance(value, dict):
+        return {
+            k: f"<{len(v)} bytes base64>" if k == "DocumentBase64" and isinstance(v, str) else _redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
+
+def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    logger = _get_logger(func.__name__, log_path)
+
+    try:
+        # Log the function call and its arguments as a single record, the
+        # arguments are only formatted if the record is actually emitted
+        logger.info("Calling %s | Args: %r | Kwargs: %r", func.__name__, args, kwargs)
+
+        # Call the function and get the result
+        result = func(*args, **kwargs)
+
+        # Log the function's return value, redacting it is skipped when INFO is off
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s returned | Result: %r", func.__name__, _redact(result))
+
+        return result
+
+    except Exception as e:
+        logger.exception("Exception occurred: %s", e)
+        raise
+
+
+def _cache_key(url: str, parameters: dict) -> str:
+    # the token differs between runs but does not change the response
+    without_token: dict = {
+        key: {k: v for k, v in value.items() if k != "Token"} if isinstance(value, dict) else value
+        for key, value in parameters.items()
+    }
+    return hashlib.sha256(
+        json.dumps({"url": url, "parameters": without_token}, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _cache_get(key: str, ttl: int) -> Optional[dict]:
+    path = os.path.join(_CACHE_DIR, f"{key}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, "rb") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_set(key: str, response: dict) -> None:
+    # the cache is best effort, a failed write only means the next run calls the API
+    path = os.path.join(_CACHE_DIR, f"{key}.json")
+    try:
+        os.makedirs(_CACHE_DIR, mode=0o700, exist_ok=True)
+        fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(response, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+
+
+def extract_doc(resp: Optional[dict], *path: str) -> Any:
+    # walks resp down the given keys, any missing level gives None
+    cur: Any = resp
+    for key in path:
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(key)
+        if cur is None:
+            return None
+    return cur
+
+
+class FicsApiError(Exception):
+    # a failed API call for callers that did not pass in a module to fail
+    pass
+
+
+def _fail(module, msg: str) -> None:
+    # modules that pass themselves in fail the task, the others get the error raised
+    if module is not None:
+        module.fail_json(msg=msg, changed=False, failed=True)
+    raise FicsApiError(msg)
+
+
+def _request(
+    session: requests.Session, method: str, url: str, **kwargs
+) -> requests.Response:
+    # without a timeout a hung FICS server would block the task forever
+    return session.request(method.upper(), url, timeout=_TIMEOUT, **kwargs)
+
+
+def call_api(
+    base_url: str,
+    method: str,
+    endpoint: str,
+    parameters: dict,
+    module=None,
+    session: requests.Session = SESSION,
+    cache_ttl: int = 0,
+    force_refresh: bool = False,
+    body: Optional[bytes] = None,
+) -> Optional[dict]:
+    # TODO: yes I know that module should not be passed in as it makes the function more impure but I'll rewrite this to use exception handling or error return types in the future... maybe
+    if method not in _METHODS:
+        _fail(module, f"Invalid API method '{method}'")
+        return None
+
+    url: str = base_url + endpoint
+    cache_key: Optional[str] = None
+    if cache_ttl > 0:
+        cache_key = _cache_key(url, parameters)
+        if not force_refresh:
+            cached: Optional[dict] = _cache_get(cache_key, cache_ttl)
+            if cached is not None:
+                return cached
+
+    # callers with a static message can pass the already serialised body,
+    # parameters is then only used for the cache key
+    if body is None:
+        body = _json_dumps(parameters)
+
+    # Send the request over the shared session
+    try:
+        response = _request(session, method, url, data=body, headers=_HEADERS)
+    except requests.exceptions.RequestException as e:
+        _fail(module, f"API call failed: {e}")
+        return None
+
+    # Capture the response
+    if response.status_code != 200:
+        _fail(
+            module,
+            f"Error response code ({response.status_code}) from api call: {response.text}",
+        )
+        return None
+
+    try:
+        api_response: dict = _json_loads(response.content)
+    except ValueError as e:
+        _fail(module, f"Invalid JSON in api response: {e}")
+        return None
+    # failed calls are never cached so they are retried on the next run
+    if cache_key is not None and api_response.get("ApiCallSuccessful", None):
+        _cache_set(cache_key, api_response)
+    return api_response
+
+
+def _set_path(target: dict, prefix: str, value: Any) -> None:
+    keys: list = prefix.split(".")
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = value
+
+
+def fetch_report_to_file(
+    base_url: str,
+    method: str,
+    endpoint: str,
+    parameters: dict,
+    documents: dict,
+    module=None,
+    session: requests.Session = SESSION,
+    body: Optional[bytes] = None,
+) -> Optional[dict]:
+    # the response is parsed while it is downloaded, documents maps the path of
+    # each base64 string (e.g. "Document.DocumentBase64") to the file it is
+    # decoded straight into, the full response dict is never built, only its
+    # scalar fields outside of lists are returned with placeholders for the
+    # documents that say whether they were written
+    if ijson is None:
+        _fail(module, "streaming the API response requires the ijson package")
+        return None
+    if method not in _METHODS:
+        _fail(module, f"Invalid API method '{method}'")
+        return None
+
+    url: str = base_url + endpoint
+    if body is None:
+        body = _json_dumps(parameters)
+
+    # ApiCallSuccessful can come after the documents, so they are only moved
+    # over their destinations once the whole response says the call succeeded
+    # and every requested document was decoded, otherwise nothing is written
+    part_paths: dict = {dest: f"{dest}.part" for dest in documents.values()}
+    api_response: dict = {}
+    decoded: list = []
+    complete: bool = False
+    try:
+        for dest in documents.values():
+            ensure_dir(os.path.dirname(dest))
+        with _request(
+            session, method, url, data=body, headers=_HEADERS, stream=True
+        ) as response:
+            if response.status_code != 200:
+                _fail(
+                    module,
+                    f"Error response code ({response.status_code}) from api call: {response.text}",
+                )
+                return None
+
+            # urllib3 undoes the gzip/deflate encoding before ijson reads the body
+            response.raw.decode_content = True
+            for prefix, event, value in ijson.parse(response.raw, buf_size=65536, use_float=True):
+                if event not in _SCALAR_EVENTS or "item" in prefix.split("."):
+                    continue
+                # a null or otherwise non-string document is kept as it is, so
+                # callers see a missing file instead of a decode error
+                if prefix in documents and event == "string":
+                    stream_b64_to_file(value, part_paths[documents[prefix]])
+                    decoded.append(prefix)
+                    value = "<not written>"
+                _set_path(api_response, prefix, value)
+        complete = bool(api_response.get("ApiCallSuccessful", None)) and set(decoded) == set(documents)
+    except (requests.exceptions.RequestException, ijson.JSONError) as e:
+        _fail(module, f"API call failed: {e}")
+        return None
+    except (OSError, ValueError) as e:
+        # a destination that cannot be created, bad base64 or a failed write
+        # while the document was being decoded
+        _fail(module, f"failed to create file: {e}")
+        return None
+    finally:
+        if not complete:
+            for part_path in part_paths.values():
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    # the call failed or a document is missing, the decoded ones were removed above
+    if not complete:
+        return api_response
+    try:
+        for prefix in decoded:
+            os.replace(part_paths[documents[prefix]], documents[prefix])
+            _set_path(api_response, prefix, f"<written to {documents[prefix]}>")
+    except OSError as e:
+        for part_path in part_paths.values():
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        _fail(module, f"failed to create file: {e}")
+        return None
+    return api_response
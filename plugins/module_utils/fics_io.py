@@ -0,0 +1,46 @@
+# Copyright: (c) 2024, David Villafaña <david.villafana@capcu.org>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+import binascii
+import os
+
+try:
+    # SIMD accelerated decoder, a drop-in for the stdlib one when installed
+    from pybase64 import b64decode as _b64decode
+except ImportError:
+    _b64decode = binascii.a2b_base64
+
+__metaclass__ = type
+
+# base64 is decoded 1 MiB (a multiple of 4 characters) at a time, each decoded
+# chunk goes straight to the file in one write, the file is not fsynced
+_B64_CHUNK_SIZE = 1 << 20
+# directories already created (or found) by this process
+_MADE_DIRS: set = set()
+
+
+def ensure_dir(path: str) -> None:
+    # a directory is only stat'ed the first time it is asked for, an empty
+    # path (a file in the working directory) needs nothing
+    if not path or path in _MADE_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _MADE_DIRS.add(path)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    # os.write may be partial, slicing the memoryview resumes without copying
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def stream_b64_to_file(b64_str: str, path: str) -> None:
+    # the decoded file is never held in memory as a whole, a payload that fits
+    # in one chunk is decoded and written with a single os.write
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for i in range(0, len(b64_str), _B64_CHUNK_SIZE):
+            _write_all(fd, _b64decode(b64_str[i:i + _B64_CHUNK_SIZE]))
+    finally:
+        os.close(fd)
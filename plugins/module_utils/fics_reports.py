@@ -0,0 +1,114 @@
+# Copyright: (c) 2024, David Villafaña <david.villafana@capcu.org>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import _json_dumps, call_api, fetch_report_to_file, log_function_call
+from datetime import datetime
+from typing import Optional
+
+__metaclass__ = type
+
+
+# the parts of the GetTrialBalanceReport message that do not change between calls
+_TRIAL_BALANCE_MESSAGE: dict = {
+    "AllLoans": True,
+    "CreateHistory": True,
+    "NegativeTiBalanceLoans": False,
+    "IncludePif": False,
+    "LoanSort": False,
+    "LoanNameSort": False,
+    "InvestorLoanSort": False,
+    "BankInvestorGroupSort": True,
+    "PageBreakInvestor": False,
+    "ReportNotes": "",
+}
+# the serialised message without its closing braces, only the token is appended per call
+_TRIAL_BALANCE_BODY_PREFIX: bytes = _json_dumps({"Message": _TRIAL_BALANCE_MESSAGE})[:-2]
+
+
+def get_trial_balance_report(
+    api_url: str,
+    api_token: str,
+    api_log_directory: str,
+    cache_ttl: int = 0,
+    force_refresh: bool = False,
+    stream_to: Optional[str] = None,
+) -> dict:
+    body: bytes = _TRIAL_BALANCE_BODY_PREFIX + b',"Token":' + _json_dumps(api_token) + b"}}"
+    if stream_to is not None:
+        # streamed responses are written to disk as they arrive and never cached
+        return log_function_call(
+            api_log_directory,
+            fetch_report_to_file,
+            base_url=api_url,
+            method="post",
+            endpoint="GetTrialBalanceReport",
+            parameters={"Message": _TRIAL_BALANCE_MESSAGE},
+            documents={"Document.DocumentBase64": stream_to},
+            body=body,
+        )
+    return log_function_call(
+        api_log_directory,
+        call_api,
+        base_url=api_url,
+        method="post",
+        endpoint="GetTrialBalanceReport",
+        # the cache key ignores the token, so the static message is enough here
+        parameters={"Message": _TRIAL_BALANCE_MESSAGE},
+        cache_ttl=cache_ttl,
+        force_refresh=force_refresh,
+        body=body,
+    )
+
+
+# the parts of the RunLateNoticesReport message that do not change between calls
+_LATE_NOTICES_MESSAGE: dict = {
+    "PrintLateNoticesLetter": True,
+    "UseLogo": True,
+    "IncludeReturnedCheckChargeFees": True,
+    "IncludeUnappliedBalance": True,
+    "IncludeUnpaidLateCharges": True,
+    "SelectedSortByType": 1,
+    "IncludeFACTAct": True,
+}
+
+
+def late_notices_period(now: datetime) -> tuple:
+    # late notices cover the current month up to now
+    return datetime(year=now.year, month=now.month, day=1, hour=0, minute=0, second=0), now
+
+
+def run_late_notices_report(
+    api_log_directory: str,
+    api_url: str,
+    api_token: str,
+    beginning_date: datetime,
+    ending_date: datetime,
+    stream_to: Optional[tuple] = None,
+):
+    message: dict = _LATE_NOTICES_MESSAGE.copy()
+    message["BeginningDate"] = beginning_date.strftime("%Y-%m-%dT%H:%M:%S")
+    message["EndingDate"] = ending_date.strftime("%Y-%m-%dT%H:%M:%S")
+    message["Token"] = api_token
+    params: dict = {"Message": message}
+    if stream_to is not None:
+        # stream_to is the (late notices, summary) pair of destinations
+        return log_function_call(
+            api_log_directory,
+            fetch_report_to_file,
+            base_url=api_url,
+            method="post",
+            endpoint="RunLateNoticesReport",
+            parameters=params,
+            documents={
+                "LateNotice.Document.DocumentBase64": stream_to[0],
+                "LateNoticeSummaryReport.Document.DocumentBase64": stream_to[1],
+            },
+        )
+    return log_function_call(
+        api_log_directory,
+        call_api,
+        base_url=api_url,
+        method="post",
+        endpoint="RunLateNoticesReport",
+        parameters=params,
+    )
@@ -4,11 +4,11 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import call_api, fetch_report_to_file
 from typing import Optional
-import requests
 from datetime import datetime
 import os
-import base64
 
 __metaclass__ = type
 
@@ -29,7 +29,11 @@ description:
 author:
     - David Villafaña IV
 
-requirements: [ ]
+requirements:
+     - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding)
+     - ijson (optional, required for stream_response)
 
 options:
     dest:
@@ -44,6 +48,13 @@ options:
         description: this is the api token used for authentication to the API
         required: true
         type: str
+    stream_response:
+        description:
+            - parse the API response while it downloads and decode the file straight into dest, the whole response is never held in memory
+            - requires the ijson package, api_response only holds the small fields of the response
+        required: false
+        type: bool
+        default: false
 
 """
 
@@ -59,64 +70,51 @@ RETURN = r"""
 """
 
 
-def call_api(
-    base_url: str, method: str, endpoint: str, parameters: dict, module: dict
-) -> Optional[dict]:
-    headers = {
-        "Content-Type": "application/json",
+# the parts of the CreateRequest payload that do not change between calls
+_CREATE_REQUEST_TEMPLATE: dict = {
+    "CreateRequest": {
+        "FilePath": "sample string",
+        "Loans": [500, 500],
+        "Investors": [
+            {
+                "Bank": "sample string",
+                "Investor": "sample string",
+                "Group": "sample string",
+                "CompositeInvestorCode": "sample string",
+            },
+            {
+                "Bank": "sample string",
+                "Investor": "sample string",
+                "Group": "sample string",
+                "CompositeInvestorCode": "sample string",
+            },
+        ],
+        "Payees": [1, 1],
+        "ErrorMessage": "sample string",
+        "ApiParameters": "sample string",
     }
-
-    if method == "post":
-        response = requests.post(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "get":
-        response = requests.get(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "put":
-        response = requests.put(base_url + endpoint, json=parameters, headers=headers)
-    elif method == "delete":
-        response = requests.delete(
-            base_url + endpoint, json=parameters, headers=headers
-        )
-    else:
-        module.fail_json(
-            msg=f"Invalid API method '{method}'", changed=False, failed=True
-        )
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        module.fail_json(
-            msg=f"Error response code ({response.status_code}) from api call: {response.text}",
-            changed=False,
-            failed=True,
-        )
+}
 
 
-def get_create_allied_insurance_interface_file(module: dict) -> Optional[dict]:
+def get_create_allied_insurance_interface_file(
+    system_time: str, module: dict
+) -> Optional[dict]:
     params: dict = {
         "CreateRequest": {
-            "FilePath": "sample string",
-            "Loans": [500, 500],
-            "Investors": [
-                {
-                    "Bank": "sample string",
-                    "Investor": "sample string",
-                    "Group": "sample string",
-                    "CompositeInvestorCode": "sample string",
-                },
-                {
-                    "Bank": "sample string",
-                    "Investor": "sample string",
-                    "Group": "sample string",
-                    "CompositeInvestorCode": "sample string",
-                },
-            ],
-            "Payees": [1, 1],
-            "ErrorMessage": "sample string",
-            "SystemDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            **_CREATE_REQUEST_TEMPLATE["CreateRequest"],
+            "SystemDate": system_time,
             "Token": module.params["api_token"],
-            "ApiParameters": "sample string",
         }
     }
+    if module.params["stream_response"]:
+        return fetch_report_to_file(
+            module.params["special_service_api_url"],
+            "post",
+            "CreateAlliedInsuranceInterfaceFile",
+            parameters=params,
+            documents={"File": module.params["dest"]},
+            module=module,
+        )
     return call_api(
         module.params["special_service_api_url"],
         "post",
@@ -131,6 +129,7 @@ def run_module():
         dest=dict(type="str", required=True, no_log=False),
         special_service_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
+        stream_response=dict(type="bool", required=False, default=False, no_log=False),
     )
 
     # seed the result dict in the object
@@ -146,29 +145,33 @@ def run_module():
     # supports check mode
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
 
-    output_file_path: str = module.params["dest"]
-
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
-    # state with no modifications
+    # state with no modifications, before any parameters are processed or
+    # files and API calls are touched
     if module.check_mode:
         module.exit_json(**result)
 
+    output_file_path: str = module.params["dest"]
+
     try:
-        os.makedirs(name=str(os.path.dirname(output_file_path)), exist_ok=True)
+        ensure_dir(os.path.dirname(output_file_path))
     except Exception as e:
         module.fail_json(
             msg=f"failed to create parent directories: {e}", changed=False, failed=True
         )
 
-    api_response: dict = get_create_allied_insurance_interface_file(module)
+    system_time: str = datetime.now().isoformat(timespec="seconds")
     try:
+        api_response: dict = get_create_allied_insurance_interface_file(
+            system_time=system_time, module=module
+        )
         if api_response.get("ApiCallSuccessful", None):
             base64_file = api_response.get("File", None)
             if base64_file:
-                txt_data = base64.b64decode(base64_file)
-                with open(module.params["dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
+                # a streamed response has already been written to dest
+                if not module.params["stream_response"]:
+                    stream_b64_to_file(base64_file, module.params["dest"])
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"
@@ -4,12 +4,9 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Optional, Callable, Any
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import SESSION, call_api, log_function_call
 import requests
 from datetime import datetime
-import logging
-import os
-from urllib.parse import urljoin as join
 
 __metaclass__ = type
 
@@ -34,6 +31,7 @@ requirements:
      - functools >= 0.5
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
      - datetime >= 5.5
 
 options:
@@ -63,88 +61,6 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(
-    base_url: str, method: str, endpoint: str, parameters: dict, module: dict
-) -> Optional[dict]:
-    headers = {
-        "Content-Type": "application/json",
-    }
-
-    if method == "post":
-        response = requests.post(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "get":
-        response = requests.get(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "put":
-        response = requests.put(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    elif method == "delete":
-        response = requests.delete(
-            join(base_url, endpoint), json=parameters, headers=headers
-        )
-    else:
-        module.fail_json(
-            msg=f"Invalid API method '{method}'", changed=False, failed=True
-        )
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        module.fail_json(
-            msg=f"Error response code ({response.status_code}) from api call: {response.text}",
-            changed=False,
-            failed=True,
-        )
-
-
 def create_metro_2_file_and_report(
     api_url: str,
     file_path: str,
@@ -152,6 +68,7 @@ def create_metro_2_file_and_report(
     system_time: str,
     api_log_directory: str,
     module,
+    session: requests.Session,
 ) -> dict:
     # TODO: yes I know that module should not be passed in as it makes the function more impure but I'll rewrite this to use exception handling or error return types in the future... maybe
     params = {
@@ -178,11 +95,16 @@ def create_metro_2_file_and_report(
         endpoint="/BatchService.svc/REST/CreateMetro2FileAndReport",
         parameters=params,
         module=module,
+        session=session,
     )
 
 
 def get_ms_company_information(
-    api_url: str, api_token: str, api_log_directory: str, module
+    api_url: str,
+    api_token: str,
+    api_log_directory: str,
+    module,
+    session: requests.Session,
 ) -> dict:
     # TODO: yes I know that module should not be passed in as it makes the function more impure but I'll rewrite this to use exception handling or error return types in the future... maybe
     params: dict = {"Message": {"Token": api_token}}
@@ -194,6 +116,7 @@ def get_ms_company_information(
         endpoint="/MortgageServicerService.svc/REST/GetMsCompanyInformation",
         parameters=params,
         module=module,
+        session=session,
     )
 
 
@@ -217,22 +140,27 @@ def run_module():
     # supports check mode
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
 
-    api_url: str = module.params["api_url"]
-    api_token: str = module.params["api_token"]
-    system_time: str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-    api_log_directory: str = module.params["api_log_directory"]
-
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
-    # state with no modifications
+    # state with no modifications, before any parameters are processed or
+    # files and API calls are touched
     if module.check_mode:
         module.exit_json(**result)
 
+    api_url: str = module.params["api_url"].rstrip("/")
+    api_token: str = module.params["api_token"]
+    system_time: str = datetime.now().isoformat(timespec="seconds")
+    api_log_directory: str = module.params["api_log_directory"]
+
+    # both calls go to the same host, sharing one session lets the second call
+    # reuse the connection opened by the first
+    session: requests.Session = SESSION
     credit_bureau_file_path: str = get_ms_company_information(
         api_url=api_url,
         api_token=api_token,
         api_log_directory=api_log_directory,
         module=module,
+        session=session,
     )["FilePath"]
     bureau_response: dict = create_metro_2_file_and_report(
         file_path=credit_bureau_file_path,
@@ -241,6 +169,7 @@ def run_module():
         api_log_directory=api_log_directory,
         system_time=system_time,
         module=module,
+        session=session,
     )
 
     try:
@@ -254,20 +183,20 @@ def run_module():
     except Exception as e:
         module.fail_json(msg=f"failed to create file: {e}", changed=False, failed=True)
 
-    # here we will include only the data we need
-    bureau_response["Document"][
-        "DocumentBase64"
-    ] = "[REDACTED] - base64 encoded data that we will not include"
-    bureau_response["Data"][
-        "RecapReportItems"
-    ] = "[REDACTED] - list of the loans and some of their metadata"
-    bureau_response["Data"][
-        "CreditBureauLoans"
-    ] = "[REDACTED] - list of customer account numbers"
-    bureau_response["Data"]["FileTotals"] = "[REDACTED] - list of file sizes"
-    bureau_response["file_path"] = credit_bureau_file_path
-
-    result["api_response"] = bureau_response
+    # here we will include only the data we need, the large document and loan
+    # lists are left out instead of being serialized back to Ansible
+    result["api_response"] = {
+        "Document": {
+            "DocumentBase64": "[REDACTED] - base64 encoded data that we will not include"
+        },
+        "Data": {
+            "RecapReportItems": "[REDACTED] - list of the loans and some of their metadata",
+            "CreditBureauLoans": "[REDACTED] - list of customer account numbers",
+            "FileTotals": "[REDACTED] - list of file sizes",
+        },
+        "file_path": credit_bureau_file_path,
+        "ApiCallSuccessful": bureau_response.get("ApiCallSuccessful"),
+    }
     result["msg"] = "Credit Bureau Files Created"
     result["changed"] = True
     # in the event of a successful module execution, you will want to
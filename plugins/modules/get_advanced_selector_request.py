@@ -4,10 +4,9 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
-import requests
-import logging
-import os
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import FicsApiError, call_api, log_function_call
+from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 
 __metaclass__ = type
 
@@ -32,6 +31,7 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
 
 options:
     query_list:
@@ -51,6 +51,15 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    concurrency:
+        description:
+            - number of requests the query_list is split across, these requests are sent concurrently
+            - list fields of the responses are merged in query_list order at every depth
+            - any other field becomes a list with the value of every request that returned it, e.g. a count of 1 from two requests is returned as [1, 1]
+            - only use this if the queries in query_list are independent of each other
+        required: false
+        type: int
+        default: 1
 """
 
 EXAMPLES = r"""
@@ -62,84 +71,85 @@ EXAMPLES = r"""
     core_api_url: http://mortgageservicer.fics/MortgageServicerService.svc/REST/
     api_token: ASDFASDFJSDFSHFJJSDGFSJGQWEUI123123SDFSDFJ12312801C15034264BC98B33619F4A547AECBDD412D46A24D2560D5EFDD8DEDFE74325DC2E7B156C60B942
     api_log_directory: /mnt/fics/etc/api_logs/
+
+- name: get_advanced_selector_request split across concurrent requests
+  get_advanced_selector_request:
+    query_list:
+      - { key: val, key1: val1 }
+      - { key0: val0, key2: val2 }
+    core_api_url: http://mortgageservicer.fics/MortgageServicerService.svc/REST/
+    api_token: ASDFASDFJSDFSHFJJSDGFSJGQWEUI123123SDFSDFJ12312801C15034264BC98B33619F4A547AECBDD412D46A24D2560D5EFDD8DEDFE74325DC2E7B156C60B942
+    api_log_directory: /mnt/fics/etc/api_logs/
+    concurrency: 2
 """
 
 RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
+def call_api_concurrently(
+    base_url: str, method: str, endpoint: str, parameters_list: list[dict]
+) -> list:
+    # every request shares SESSION, so the pool size bounds the open connections
+    with ThreadPoolExecutor(max_workers=len(parameters_list)) as executor:
+        return list(
+            executor.map(
+                lambda parameters: call_api(base_url, method, endpoint, parameters),
+                parameters_list,
+            )
+        )
 
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
 
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
+class ResponseMergeError(Exception):
+    # the chunked responses cannot be combined into one
+    pass
+
+
+def per_chunk(value: Any) -> Any:
+    # scalars become one entry lists so that every chunk's value is kept when
+    # the responses are merged, lists and dicts are merged as payload
+    if isinstance(value, dict):
+        return {key: per_chunk(item) for key, item in value.items()}
+    if isinstance(value, list) or value is None:
+        return value
+    return [value]
+
+
+def merge_values(left: Any, right: Any, path: str) -> Any:
+    # lists are concatenated and dicts merged at every depth, a null or missing
+    # value takes the other side
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if isinstance(left, list) and isinstance(right, list):
+        return left + right
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged: dict = dict(left)
+        for key, value in right.items():
+            merged[key] = merge_values(merged.get(key), value, f"{path}.{key}" if path else key)
+        return merged
+    raise ResponseMergeError(f"chunks returned a list and an object for '{path}'")
+
+
+def merge_responses(responses: list) -> Optional[dict]:
+    if any(response is None for response in responses):
         return None
+    merged: dict = {}
+    for response in responses:
+        merged = merge_values(
+            merged,
+            per_chunk({k: v for k, v in response.items() if k != "ApiCallSuccessful"}),
+            "",
+        )
+    merged["ApiCallSuccessful"] = all(
+        response.get("ApiCallSuccessful", None) for response in responses
+    )
+    return merged
 
 
-def get_advanced_selector_request(api_url: str, api_token: str, api_log_directory: str, query_list: list[dict]) -> dict:
-    params: dict = {
+def build_params(api_token: str, query_list: list[dict]) -> dict:
+    return {
         "Message": {
             "Content": {
                 "QueryList": query_list
@@ -147,13 +157,30 @@ def get_advanced_selector_request(api_url: str, api_token: str, api_log_director
             "Token": api_token,
         }
     }
+
+
+def get_advanced_selector_request(api_url: str, api_token: str, api_log_directory: str, query_list: list[dict], concurrency: int = 1) -> dict:
+    if concurrency > 1 and len(query_list) > 1:
+        chunk_size: int = -(-len(query_list) // concurrency)
+        responses: list = log_function_call(
+            api_log_directory,
+            call_api_concurrently,
+            api_url,
+            "post",
+            "GetAdvancedSelectorRequest",
+            parameters_list=[
+                build_params(api_token, query_list[i:i + chunk_size])
+                for i in range(0, len(query_list), chunk_size)
+            ],
+        )
+        return merge_responses(responses)
     return log_function_call(
         api_log_directory,
         call_api,
         api_url,
         "post",
         "GetAdvancedSelectorRequest",
-        parameters=params,
+        parameters=build_params(api_token, query_list),
     )
 
 
@@ -163,6 +190,7 @@ def run_module():
         core_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        concurrency=dict(type="int", required=False, default=1, no_log=False),
     )
 
     # seed the result dict in the object
@@ -178,20 +206,38 @@ def run_module():
     # supports check mode
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
 
+    # if the user is working with this module in only check mode we do not
+    # want to make any changes to the environment, just return the current
+    # state with no modifications, before any parameters are processed or
+    # files and API calls are touched
+    if module.check_mode:
+        module.exit_json(**result)
+
     api_url: str = module.params["core_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
     query_list: list[dict] = module.params["query_list"]
+    concurrency: int = module.params["concurrency"]
 
-    # if the user is working with this module in only check mode we do not
-    # want to make any changes to the environment, just return the current
-    # state with no modifications
-    if module.check_mode:
-        module.exit_json(**result)
+    try:
+        query_resp: dict = get_advanced_selector_request(
+            api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, query_list=query_list, concurrency=concurrency
+        )
+    except FicsApiError as e:
+        module.fail_json(msg=str(e), changed=False, failed=True)
+    except ResponseMergeError as e:
+        module.fail_json(
+            msg=f"failed to merge the concurrent responses: {e}",
+            changed=False,
+            failed=True,
+        )
 
-    query_resp: dict = get_advanced_selector_request(
-        api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, query_list=query_list
-    )
+    if query_resp is None:
+        module.fail_json(
+            msg="API call unsuccessful",
+            changed=False,
+            failed=True,
+        )
 
     if query_resp.get("ApiCallSuccessful", None):
         result["changed"] = False
@@ -0,0 +1,236 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2024, David Villafaña <david.villafana@capcu.org>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import FicsApiError, extract_doc
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_reports import (
+    get_trial_balance_report,
+    late_notices_period,
+    run_late_notices_report,
+)
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: get_fics_reports_batch
+
+short_description: Calls the FICS Mortgage Servicer batch service API for several reports at once and creates their PDFs at the desired locations
+
+# If this is part of a collection, you need to use semantic versioning,
+# i.e. the version is of the form "2.5.0" and not "2.4".
+version_added: "2.3.0"
+
+description:
+    - Calls the FICS Mortgage Servicer batch service API for every report in the reports list concurrently and writes each report PDF to its destination.
+    - This replaces one get_trial_balance_report or run_late_notices_report task per report with a single task.
+    - The result is a list with the outcome of every report in the api_response variable
+    - Disclaimer, this module has only been tested for our exact use case
+
+author:
+    - David Villafaña IV
+
+requirements:
+     - logging >= 0.4.9.6
+     - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding)
+     - ijson (optional, required for stream_response)
+
+options:
+    reports:
+        description: this is a list of the reports to create
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            type:
+                description: the report to run
+                required: true
+                type: str
+                choices: [ trial_balance, late_notices ]
+            dest:
+                description: This is the full path to where the report file will be created, it creates parent directories if they do not exist
+                required: true
+                type: str
+            summary_dest:
+                description: This is the full path to where the late notices summary file will be created, required for late_notices
+                required: false
+                type: str
+    batch_service_api_url:
+        description: This is the URL of the desired API
+        required: true
+        type: str
+    api_token:
+        description: this is the api token used for authentication to the API
+        required: true
+        type: str
+    api_log_directory:
+        description: this is the directory that the API logs will be created in
+        required: false
+        type: str
+    concurrency:
+        description: maximum number of reports that are requested at the same time
+        required: false
+        type: int
+        default: 4
+    stream_response:
+        description:
+            - parse every API response while it downloads and decode the report files straight into their destinations, the whole response is never held in memory
+            - requires the ijson package
+        required: false
+        type: bool
+        default: false
+"""
+
+EXAMPLES = r"""
+- name: Create the trial balance and late notices reports via FICS API
+  get_fics_reports_batch:
+    reports:
+      - type: trial_balance
+        dest: /mnt/fics/etc/trial_balance_report.pdf
+      - type: late_notices
+        dest: /mnt/fics/Mortgage Services/etc/late_notices.pdf
+        summary_dest: /mnt/fics/Mortgage Services/etc/late_notices_summary.pdf
+    batch_service_api_url: http://mortgageservicer.fics/BatchService.svc/REST/
+    api_token: ASDFASDFJSDFSHFJJSDGFSJGQWEUI123123SDFSDFJ12312801C15034264BC98B33619F4A547AECBDD412D46A24D2560D5EFDD8DEDFE74325DC2E7B156C60B942
+    api_log_directory: /mnt/fics/etc/api_logs/
+"""
+
+RETURN = r"""
+"""
+
+
+def fetch_report(
+    api_url: str, api_token: str, api_log_directory: str, report: dict, stream_response: bool = False
+) -> dict:
+    outcome: dict = dict(type=report["type"], dest=report["dest"], failed=True, msg="")
+    try:
+        if report["type"] == "trial_balance":
+            resp: dict = get_trial_balance_report(
+                api_url=api_url, api_token=api_token, api_log_directory=api_log_directory,
+                stream_to=report["dest"] if stream_response else None,
+            )
+            documents: list = [
+                (extract_doc(resp, "Document", "DocumentBase64"), report["dest"]),
+            ]
+        else:
+            beginning_date, ending_date = late_notices_period(datetime.now())
+            resp = run_late_notices_report(
+                api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, beginning_date=beginning_date, ending_date=ending_date,
+                stream_to=(report["dest"], report["summary_dest"]) if stream_response else None,
+            )
+            outcome["summary_dest"] = report["summary_dest"]
+            documents = [
+                (extract_doc(resp, "LateNotice", "Document", "DocumentBase64"), report["dest"]),
+                (extract_doc(resp, "LateNoticeSummaryReport", "Document", "DocumentBase64"), report["summary_dest"]),
+            ]
+
+        if not extract_doc(resp, "ApiCallSuccessful"):
+            outcome["msg"] = "API call unsuccessful"
+            return outcome
+        if not all(base64_file for base64_file, _ in documents):
+            outcome["msg"] = "One or more files missing from api response!"
+            return outcome
+
+        # a streamed response has already been written to every dest
+        if not stream_response:
+            for base64_file, dest in documents:
+                ensure_dir(os.path.dirname(dest))
+                stream_b64_to_file(base64_file, dest)
+    except FicsApiError as e:
+        # the shared calls raise instead of failing the task, so every report
+        # keeps its own error
+        outcome["msg"] = str(e)
+        return outcome
+    except Exception as e:
+        outcome["msg"] = f"failed to create file: {e}"
+        return outcome
+
+    outcome["failed"] = False
+    outcome["msg"] = f"Wrote file at {report['dest']}"
+    return outcome
+
+
+def run_module():
+    module_args = dict(
+        reports=dict(
+            type="list",
+            elements="dict",
+            required=True,
+            no_log=False,
+            options=dict(
+                type=dict(type="str", required=True, choices=["trial_balance", "late_notices"]),
+                dest=dict(type="str", required=True, no_log=False),
+                summary_dest=dict(type="str", required=False, no_log=False),
+            ),
+            required_if=[("type", "late_notices", ["summary_dest"])],
+        ),
+        batch_service_api_url=dict(type="str", required=True, no_log=False),
+        api_token=dict(type="str", required=True, no_log=True),
+        api_log_directory=dict(type="str", required=False, no_log=False),
+        concurrency=dict(type="int", required=False, default=4, no_log=False),
+        stream_response=dict(type="bool", required=False, default=False, no_log=False),
+    )
+
+    # seed the result dict in the object
+    # we primarily care about changed and state
+    # changed is if this module effectively modified the target
+    # state will include any data that you want your module to pass back
+    # for consumption, for example, in a subsequent task
+    result = dict(changed=False, msg="", failed=False, api_response=[])
+
+    # the AnsibleModule object will be our abstraction working with Ansible
+    # this includes instantiation, a couple of common attr would be the
+    # args/params passed to the execution, as well as if the module
+    # supports check mode
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
+
+    # if the user is working with this module in only check mode we do not
+    # want to make any changes to the environment, just return the current
+    # state with no modifications, before any parameters are processed or
+    # files and API calls are touched
+    if module.check_mode:
+        module.exit_json(**result)
+
+    api_url: str = module.params["batch_service_api_url"]
+    api_token: str = module.params["api_token"]
+    api_log_directory: str = module.params["api_log_directory"]
+    reports: list[dict] = module.params["reports"]
+    concurrency: int = module.params["concurrency"]
+    stream_response: bool = module.params["stream_response"]
+
+    # every report is requested and written on its own worker, the workers
+    # share the pooled session so the requests overlap on the wire
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(reports)))) as executor:
+        outcomes: list = list(
+            executor.map(
+                lambda report: fetch_report(api_url, api_token, api_log_directory, report, stream_response),
+                reports,
+            )
+        )
+
+    result["api_response"] = outcomes
+    result["changed"] = any(not outcome["failed"] for outcome in outcomes)
+    if any(outcome["failed"] for outcome in outcomes):
+        module.fail_json(
+            msg="One or more reports failed",
+            changed=result["changed"],
+            failed=True,
+            api_response=outcomes,
+        )
+
+    result["msg"] = f"Wrote {len(outcomes)} reports"
+    # in the event of a successful module execution, you will want to
+    # simple AnsibleModule.exit_json(), passing the key/value results
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    run_module()
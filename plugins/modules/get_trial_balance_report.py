@@ -4,11 +4,10 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
-import requests
-import logging
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import FicsApiError, extract_doc
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_reports import get_trial_balance_report
 import os
-import base64
 
 __metaclass__ = type
 
@@ -32,6 +31,9 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding)
+     - ijson (optional, required for stream_response)
 
 options:
     dest:
@@ -50,6 +52,25 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    cache_ttl:
+        description:
+            - number of seconds a successful API response is cached on disk under ~/.cache/fics and reused for an identical request
+            - the api_token is not part of the cache key, 0 disables the cache
+        required: false
+        type: int
+        default: 0
+    force_refresh:
+        description: always call the API, the fresh response still replaces any cached one
+        required: false
+        type: bool
+        default: false
+    stream_response:
+        description:
+            - parse the API response while it downloads and decode the report straight into dest, the whole response is never held in memory
+            - requires the ijson package, the response is not cached and api_response only holds its small fields
+        required: false
+        type: bool
+        default: false
 """
 
 EXAMPLES = r"""
@@ -65,110 +86,15 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
-def get_trial_balance_report(
-    api_url: str, api_token: str, api_log_directory: str
-) -> dict:
-    params: dict = {
-        "Message": {
-            "AllLoans": True,
-            "CreateHistory": True,
-            "NegativeTiBalanceLoans": False,
-            "IncludePif": False,
-            "LoanSort": False,
-            "LoanNameSort": False,
-            "InvestorLoanSort": False,
-            "BankInvestorGroupSort": True,
-            "PageBreakInvestor": False,
-            "ReportNotes": "",
-            "Token": api_token,
-        }
-    }
-    return log_function_call(
-        api_log_directory,
-        call_api,
-        base_url=api_url,
-        method="post",
-        endpoint="GetTrialBalanceReport",
-        parameters=params,
-    )
-
-
 def run_module():
     module_args = dict(
         dest=dict(type="str", required=True, no_log=False),
         batch_service_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        cache_ttl=dict(type="int", required=False, default=0, no_log=False),
+        force_refresh=dict(type="bool", required=False, default=False, no_log=False),
+        stream_response=dict(type="bool", required=False, default=False, no_log=False),
     )
 
     # seed the result dict in the object
@@ -187,6 +113,9 @@ def run_module():
     api_url: str = module.params["batch_service_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    cache_ttl: int = module.params["cache_ttl"]
+    force_refresh: bool = module.params["force_refresh"]
+    stream_response: bool = module.params["stream_response"]
     dest: str = module.params["dest"]
 
     # if the user is working with this module in only check mode we do not
@@ -195,25 +124,29 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    trial_resp: dict = get_trial_balance_report(
-        api_url=api_url, api_token=api_token, api_log_directory=api_log_directory
-    )
-
     try:
+        trial_resp: dict = get_trial_balance_report(
+            api_url=api_url,
+            api_token=api_token,
+            api_log_directory=api_log_directory,
+            cache_ttl=cache_ttl,
+            force_refresh=force_refresh,
+            stream_to=dest if stream_response else None,
+        )
         if trial_resp.get("ApiCallSuccessful", None):
             try:
-                os.makedirs(name=str(os.path.dirname(dest)), exist_ok=True)
+                ensure_dir(os.path.dirname(dest))
             except Exception as e:
                 module.fail_json(
                     msg=f"failed to create parent directories: {e}",
                     changed=False,
                     failed=True,
                 )
-            base64_file = trial_resp.get("Document", {}).get("DocumentBase64", None)
+            base64_file = extract_doc(trial_resp, "Document", "DocumentBase64")
             if base64_file:
-                txt_data = base64.b64decode(base64_file)
-                with open(module.params["dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
+                # a streamed response has already been written to dest
+                if not stream_response:
+                    stream_b64_to_file(base64_file, module.params["dest"])
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"
@@ -231,6 +164,8 @@ def run_module():
                 api_response=trial_resp,
             )
 
+    except FicsApiError as e:
+        module.fail_json(msg=str(e), changed=False, failed=True)
     except Exception as e:
         module.fail_json(msg=f"failed to create file: {e}", changed=False, failed=True)
 
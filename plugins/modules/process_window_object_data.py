@@ -4,12 +4,11 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import FicsApiError, call_api, extract_doc, log_function_call
+from typing import Optional
 from datetime import datetime
-import requests
-import logging
 import os
-import base64
 
 __metaclass__ = type
 
@@ -34,6 +33,8 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding)
 
 options:
     dest:
@@ -80,6 +81,18 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    cache_ttl:
+        description:
+            - number of seconds a successful API response is cached on disk under ~/.cache/fics and reused for an identical request
+            - the api_token is not part of the cache key, 0 disables the cache
+        required: false
+        type: int
+        default: 0
+    force_refresh:
+        description: always call the API, the fresh response still replaces any cached one
+        required: false
+        type: bool
+        default: false
 """
 
 EXAMPLES = r"""
@@ -102,74 +115,41 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
+# the parts of the WindowObject that do not change between calls
+_WINDOW_OBJECT: dict = {
+    "UseLogo": True,
+    "SuppressPrinting": True,
+    # TODO: get interest calculation option from custom api
+    "CalcOption": "ThreeSixtyFive",
+    "MailingOption": "Borrower",
+    "ItemLine1": "Release Fee",
+    "ItemLine1Amount": 25,
+    "Comment": """When remitting funds, please use our loan number to insure proper posting and provide us with the borrower’s forwarding address.  Funds received in this office after 12:00 noon will be processed on the next business day, with interest charged to that date.
+ 
+All payoff figures are subject to clearance of funds in transit.  The payoff is subject to final audit when presented.  Any overpayment or refunds will be mailed directly to the borrower.""",
+    # TODO: get last paid bill from custom api
+    # "DateOfLastPaidBill": "2024-09-10T17:00:50",
+    # TODO: get interest calculation method from custom api
+    "InterestCalculationMethodEnum": "DailyInterest365",
+    # "ScheduleChanges": False,
+    # "AppliedInterest": True,
+    "UseNetDeferredBalance": True,
+    "Update": True,
+    "DeferredInterestYn": True,
+    "UnappliedYn": True,
+    "DelLateChargesYn": True,
+    "TaxAndInsuranceYn": False,
+    "NegTaxAndInsuranceYn": False,
+    "ExpectedTaxAndInsuranceYn": False,
+    "CalcLateChargesYn": True,
+    "SubsidyYn": False,
+    "ForeclosureBankruptcyYn": False,
+    "ReturnCheckChargesYn": False,
+    "FinalMIPPMIYn": False,
+    "MiscFeesYn": True,
+    "LossDraftYn": False,
+    "EscrowAdvanceYn": True,
+}
 
 
 def process_window_object_data(
@@ -179,51 +159,19 @@ def process_window_object_data(
     full_name: str,
     address: str,
     city_state_zip: str,
-    payoff_date: datetime,
-    api_log_directory: str
+    payoff_date: str,
+    api_log_directory: str,
+    cache_ttl: int = 0,
+    force_refresh: bool = False,
 ):
-    params: dict = {
-        "WindowObject": {
-            "LoanId": loan_id,
-            "UseLogo": True,
-            "PayoffDate": payoff_date.strftime("%Y-%m-%dT%H:%M:%S"),
-            "SuppressPrinting": True,
-            # TODO: get interest calculation option from custom api
-            "CalcOption": "ThreeSixtyFive",
-            "MailingOption": "Borrower",
-            "MailingName": full_name,
-            "MailingAddress1": address,
-            "MailingCityStateZip": city_state_zip,
-            "ItemLine1": "Release Fee",
-            "ItemLine1Amount": 25,
-            "Comment": """When remitting funds, please use our loan number to insure proper posting and provide us with the borrower’s forwarding address.  Funds received in this office after 12:00 noon will be processed on the next business day, with interest charged to that date.
- 
-All payoff figures are subject to clearance of funds in transit.  The payoff is subject to final audit when presented.  Any overpayment or refunds will be mailed directly to the borrower.""",
-            # TODO: get last paid bill from custom api
-            # "DateOfLastPaidBill": "2024-09-10T17:00:50",
-            # TODO: get interest calculation method from custom api
-            "InterestCalculationMethodEnum": "DailyInterest365",
-            # "ScheduleChanges": False,
-            # "AppliedInterest": True,
-            "UseNetDeferredBalance": True,
-            "Update": True,
-            "DeferredInterestYn": True,
-            "UnappliedYn": True,
-            "DelLateChargesYn": True,
-            "TaxAndInsuranceYn": False,
-            "NegTaxAndInsuranceYn": False,
-            "ExpectedTaxAndInsuranceYn": False,
-            "CalcLateChargesYn": True,
-            "SubsidyYn": False,
-            "ForeclosureBankruptcyYn": False,
-            "ReturnCheckChargesYn": False,
-            "FinalMIPPMIYn": False,
-            "MiscFeesYn": True,
-            "LossDraftYn": False,
-            "EscrowAdvanceYn": True,
-            "Token": api_token,
-        }
-    }
+    window_object: dict = _WINDOW_OBJECT.copy()
+    window_object["LoanId"] = loan_id
+    window_object["PayoffDate"] = payoff_date
+    window_object["MailingName"] = full_name
+    window_object["MailingAddress1"] = address
+    window_object["MailingCityStateZip"] = city_state_zip
+    window_object["Token"] = api_token
+    params: dict = {"WindowObject": window_object}
     return log_function_call(
         api_log_directory,
         call_api,
@@ -231,6 +179,8 @@ All payoff figures are subject to clearance of funds in transit.  The payoff is
         "post",
         "ProcessWindowObjectData",
         parameters=params,
+        cache_ttl=cache_ttl,
+        force_refresh=force_refresh,
     )
 
 
@@ -247,6 +197,8 @@ def run_module():
         core_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        cache_ttl=dict(type="int", required=False, default=0, no_log=False),
+        force_refresh=dict(type="bool", required=False, default=False, no_log=False),
     )
 
     # seed the result dict in the object
@@ -265,6 +217,8 @@ def run_module():
     api_url: str = module.params["core_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    cache_ttl: int = module.params["cache_ttl"]
+    force_refresh: bool = module.params["force_refresh"]
     dest: list[dict] = module.params["dest"]
     property_address: str = module.params["property_address"]
     loan_id: int = module.params["loan_id"]
@@ -273,6 +227,9 @@ def run_module():
     state: str = module.params["state"]
     zip: str = module.params["zip"]
     payoff_date: datetime = datetime.strptime(module.params["payoff_date"], "%Y-%m-%d")
+    # both dates are formatted once, the API wants a timestamp and the file name a date
+    payoff_date_str: str = payoff_date.strftime("%Y-%m-%dT%H:%M:%S")
+    today_str: str = datetime.now().strftime("%Y-%m-%d")
 
     # if the user is working with this module in only check mode we do not
     # want to make any changes to the environment, just return the current
@@ -280,22 +237,43 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    payoff_resp: dict = process_window_object_data(
-        api_url=api_url,
-        api_token=api_token,
-        api_log_directory=api_log_directory,
-        city_state_zip=f'{city}, {state} {zip}',
-        payoff_date=payoff_date,
-        address=property_address,
-        loan_id=loan_id,
-        full_name=loan_name
-    )
+    try:
+        payoff_resp: dict = process_window_object_data(
+            api_url=api_url,
+            api_token=api_token,
+            api_log_directory=api_log_directory,
+            city_state_zip=f'{city}, {state} {zip}',
+            payoff_date=payoff_date_str,
+            address=property_address,
+            loan_id=loan_id,
+            full_name=loan_name,
+            cache_ttl=cache_ttl,
+            force_refresh=force_refresh,
+        )
+    except FicsApiError as e:
+        module.fail_json(msg=str(e), changed=False, failed=True)
     if payoff_resp.get("ApiCallSuccessful", None):
-        mail_name = payoff_resp.get("Data", {}).get("MailingCorrName", {}).replace(" ", "_") if payoff_resp.get("Data", {}).get("MailingCorrName", {}) else loan_name
-        rest_of_name: str = "_" + str(loan_id) + "_" + datetime.now().strftime("%Y-%m-%d") + '_payoff_statement.pdf'
+        mailing_name: Optional[str] = extract_doc(payoff_resp, "Data", "MailingCorrName")
+        mail_name = mailing_name.replace(" ", "_") if mailing_name else loan_name
+        rest_of_name: str = "_" + str(loan_id) + "_" + today_str + '_payoff_statement.pdf'
         file_name: str = mail_name + rest_of_name
-        with open(os.path.join(dest, file_name), 'wb') as f:
-            f.write(base64.b64decode(payoff_resp["Document"]["DocumentBase64"]))
+        try:
+            ensure_dir(dest)
+        except Exception as e:
+            module.fail_json(
+                msg=f"failed to create parent directories: {e}",
+                changed=False,
+                failed=True,
+            )
+        base64_file: Optional[str] = extract_doc(payoff_resp, "Document", "DocumentBase64")
+        if not base64_file:
+            module.fail_json(
+                msg="no report file found in api response!",
+                changed=False,
+                failed=True,
+                api_response=payoff_resp,
+            )
+        stream_b64_to_file(base64_file, os.path.join(dest, file_name))
         result["msg"] = "API call successful. File created"
         result["changed"] = False
         result["failed"] = False
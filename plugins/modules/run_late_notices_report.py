@@ -4,12 +4,12 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 from __future__ import absolute_import, division, print_function
 from ansible.module_utils.basic import AnsibleModule
-from typing import Callable, Any
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_io import ensure_dir, stream_b64_to_file
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_common import FicsApiError, extract_doc
+from ansible_collections.dtvillafana.fics.plugins.module_utils.fics_reports import late_notices_period, run_late_notices_report
 from datetime import datetime
-import requests
-import logging
+from concurrent.futures import ThreadPoolExecutor
 import os
-import base64
 
 __metaclass__ = type
 
@@ -33,6 +33,9 @@ author:
 requirements:
      - logging >= 0.4.9.6
      - requests >= 2.32.3
+     - orjson (optional, faster JSON encoding and decoding)
+     - pybase64 (optional, faster base64 decoding)
+     - ijson (optional, required for stream_response)
 
 options:
     dest:
@@ -55,6 +58,13 @@ options:
         description: this is the directory that the API logs will be created in
         required: false
         type: str
+    stream_response:
+        description:
+            - parse the API response while it downloads and decode the report files straight into their destinations, the whole response is never held in memory
+            - requires the ijson package, api_response only holds the small fields of the response
+        required: false
+        type: bool
+        default: false
 """
 
 EXAMPLES = r"""
@@ -71,101 +81,6 @@ RETURN = r"""
 """
 
 
-def log_function_call(log_path: str, func: Callable[..., Any], *args, **kwargs) -> Any:
-    # Ensure the directory for the log file exists
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-
-    # Set up logging
-    logger = logging.getLogger(func.__name__)
-    logger.setLevel(logging.INFO)
-
-    # Create a file handler
-    handler = logging.FileHandler(f"{log_path}/api_calls.log")
-    handler.setLevel(logging.INFO)
-
-    # Create a logging format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
-
-    try:
-        # Log the function call and its arguments
-        logger.info(f"Calling {func.__name__}")
-        logger.info(f"Args: {args}")
-        logger.info(f"Kwargs: {kwargs}")
-
-        # Call the function and get the result
-        result = func(*args, **kwargs)
-
-        # Log the function's return value
-        logger.info(f"Result: {result}")
-
-        return result
-
-    except Exception as e:
-        logger.exception(f"Exception occurred: {str(e)}")
-        raise
-
-    finally:
-        # Remove the handler to avoid duplicate logs in future calls
-        logger.removeHandler(handler)
-
-
-def call_api(base_url: str, method: str, endpoint: str, parameters: dict):
-    # Define the headers (if required)
-    headers = {
-        "Content-Type": "application/json",  # Adjust the content type as needed
-    }
-
-    # Send the POST request
-
-    http: dict = {
-        "post": requests.post,
-        "get": requests.get,
-        "put": requests.put,
-        "delete": requests.delete,
-    }
-    response = http[method](base_url + endpoint, json=parameters, headers=headers)
-
-    # Capture the response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(
-            f"Error response code ({response.status_code}) from api call: {response.text}"
-        )
-        return None
-
-
-def run_late_notices_report(api_log_directory: str, api_url: str, api_token: str, beginning_date: datetime, ending_date: datetime):
-    params: dict = {
-        "Message": {
-            "BeginningDate": beginning_date.strftime("%Y-%m-%dT%H:%M:%S"),
-            "EndingDate": ending_date.strftime("%Y-%m-%dT%H:%M:%S"),
-            "PrintLateNoticesLetter": True,
-            "UseLogo": True,
-            "IncludeReturnedCheckChargeFees": True,
-            "IncludeUnappliedBalance": True,
-            "IncludeUnpaidLateCharges": True,
-            "SelectedSortByType": 1,
-            "IncludeFACTAct": True,
-            "Token": api_token,
-        }
-    }
-    return log_function_call(
-        api_log_directory,
-        call_api,
-        base_url=api_url,
-        method="post",
-        endpoint="RunLateNoticesReport",
-        parameters=params,
-    )
-
-
 def run_module():
     module_args = dict(
         dest=dict(type="str", required=True, no_log=False),
@@ -173,6 +88,7 @@ def run_module():
         batch_service_api_url=dict(type="str", required=True, no_log=False),
         api_token=dict(type="str", required=True, no_log=True),
         api_log_directory=dict(type="str", required=False, no_log=False),
+        stream_response=dict(type="bool", required=False, default=False, no_log=False),
     )
 
     # seed the result dict in the object
@@ -191,6 +107,7 @@ def run_module():
     api_url: str = module.params["batch_service_api_url"]
     api_token: str = module.params["api_token"]
     api_log_directory: str = module.params["api_log_directory"]
+    stream_response: bool = module.params["stream_response"]
     dest: str = module.params["dest"]
 
     # if the user is working with this module in only check mode we do not
@@ -199,31 +116,42 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    ending_date: datetime = datetime.now()
-    beginning_date: datetime = datetime(year=ending_date.year, month=ending_date.month, day=1, hour=0, minute=0, second=0)
-    late_notice_resp: dict = run_late_notices_report(
-        api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, beginning_date=beginning_date, ending_date=ending_date
-    )
-
+    beginning_date, ending_date = late_notices_period(datetime.now())
     try:
+        late_notice_resp: dict = run_late_notices_report(
+            api_url=api_url, api_token=api_token, api_log_directory=api_log_directory, beginning_date=beginning_date, ending_date=ending_date,
+            stream_to=(dest, module.params["summary_dest"]) if stream_response else None,
+        )
         if late_notice_resp.get("ApiCallSuccessful", None):
             try:
-                os.makedirs(name=str(os.path.dirname(dest)), exist_ok=True)
+                ensure_dir(os.path.dirname(dest))
+                ensure_dir(os.path.dirname(module.params["summary_dest"]))
             except Exception as e:
                 module.fail_json(
                     msg=f"failed to create parent directories: {e}",
                     changed=False,
                     failed=True,
                 )
-            base64_late_notices_file = late_notice_resp.get("LateNotice", {}).get("Document", {}).get("DocumentBase64", None)
-            base64_late_notice_summary_file = late_notice_resp.get("LateNoticeSummaryReport", {}).get("Document", {}).get("DocumentBase64", None)
+            base64_late_notices_file = extract_doc(late_notice_resp, "LateNotice", "Document", "DocumentBase64")
+            base64_late_notice_summary_file = extract_doc(late_notice_resp, "LateNoticeSummaryReport", "Document", "DocumentBase64")
             if base64_late_notices_file and base64_late_notice_summary_file:
-                txt_data = base64.b64decode(base64_late_notices_file)
-                with open(module.params["dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
-                txt_data = base64.b64decode(base64_late_notice_summary_file)
-                with open(module.params["summary_dest"], "wb") as txt_file:
-                    txt_file.write(txt_data)
+                # a streamed response has already been written to both files
+                if not stream_response:
+                    # the two reports are independent, decode and write them side by side
+                    tasks = [
+                        (base64_late_notices_file, module.params["dest"]),
+                        (base64_late_notice_summary_file, module.params["summary_dest"]),
+                    ]
+                    with ThreadPoolExecutor(max_workers=2) as executor:
+                        futures = [executor.submit(stream_b64_to_file, *task) for task in tasks]
+                    for future in futures:
+                        error = future.exception()
+                        if error is not None:
+                            module.fail_json(
+                                msg=f"failed to create file: {error}",
+                                changed=False,
+                                failed=True,
+                            )
                 result["changed"] = True
                 result["failed"] = False
                 result["msg"] = f"Wrote file at {module.params['dest']}"
@@ -241,6 +169,8 @@ def run_module():
                 api_response=late_notice_resp,
             )
 
+    except FicsApiError as e:
+        module.fail_json(msg=str(e), changed=False, failed=True)
     except Exception as e:
         module.fail_json(msg=f"failed to create file: {e}", changed=False, failed=True)
 